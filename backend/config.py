@@ -15,6 +15,10 @@ logger = logging.getLogger("abtgs")
 # --- API Keys ---
 YANDEX_API_KEY = os.getenv("YANDEX_API_KEY")
 
+# --- SpeechKit ---
+# gzip-сжатие gRPC-стрима: Opus уже сжат, включать только для узкого канала
+SPEECHKIT_GRPC_COMPRESS = os.getenv("SPEECHKIT_GRPC_COMPRESS", "0") == "1"
+
 # --- Paths ---
 TEMP_DIR = Path("temp_files")
 TEMP_DIR.mkdir(exist_ok=True)
@@ -24,8 +28,21 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 # --- Limits ---
 MAX_FILE_SIZE_BYTES = 1 * 1024 * 1024 * 1024  # 1 GB
 MAX_CONCURRENT_TASKS = 3
-ALLOWED_EXTENSIONS = {".mp3", ".wav", ".mov", ".mxf", ".mp4", ".wmv", ".avi", ".mkv", ".ogg", ".flac"}
-ALLOWED_URL_HOSTS = {"yadi.sk", "disk.yandex.ru", "disk.yandex.com"}
+MAX_CONCURRENT_IO_TASKS = 16  # downloads and SpeechKit streams (network-bound)
+# Максимум проектов в памяти (сверх него досрочно удаляются самые старые завершённые)
+MAX_STORED_PROJECTS = int(os.getenv("MAX_STORED_PROJECTS", "1000"))
+# Параллельных соединений (Range-запросов) при скачивании с Яндекс.Диска
+YADISK_DOWNLOAD_PARTS = max(1, int(os.getenv("YADISK_DOWNLOAD_PARTS", "8")))
+ALLOWED_EXTENSIONS = frozenset({".mp3", ".wav", ".mov", ".mxf", ".mp4", ".wmv", ".avi", ".mkv", ".ogg", ".flac"})
+ALLOWED_URL_HOSTS = frozenset({"yadi.sk", "disk.yandex.ru", "disk.yandex.com"})
+
+# --- Whisper ---
+# Модель, которая загружается и прогревается при старте сервера (пусто — отключить)
+WHISPER_PRELOAD_MODEL = os.getenv("WHISPER_PRELOAD_MODEL", "medium")
+# Потоков PyTorch на распознавание: по умолчанию ядра делятся между MAX_CONCURRENT_TASKS задачами
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0")) or max(
+    1, (os.cpu_count() or 1) // MAX_CONCURRENT_TASKS
+)
 
 # --- CORS ---
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
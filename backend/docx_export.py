@@ -1,13 +1,41 @@
+from typing import IO
+from xml.sax.saxutils import escape
+
 from docx import Document
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml.ns import qn
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
 from docx.shared import Cm, Pt
 
 from backend.utils import strip_extension
 
+# Абзац сегмента: таймкод (10 pt), жирная подпись спикера, текст
+_SEGMENT_XML = (
+    '<w:p><w:r><w:rPr><w:sz w:val="20"/></w:rPr><w:t xml:space="preserve">{timecode} </w:t></w:r>'
+    '<w:r><w:rPr><w:b/></w:rPr><w:t xml:space="preserve">{label}</w:t></w:r>'
+    '<w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+)
+
+# Как в add_run: табуляция -> <w:tab/>, перевод строки -> <w:br/> внутри того же run
+_RUN_BREAKS = str.maketrans({
+    "\t": '</w:t><w:tab/><w:t xml:space="preserve">',
+    "\n": '</w:t><w:br/><w:t xml:space="preserve">',
+    "\r": '</w:t><w:br/><w:t xml:space="preserve">',
+})
+
+
+def _run_text(text: str) -> str:
+    """Экранирует текст для <w:t> шаблона с переносами и табуляциями как у add_run."""
+    return escape(text).translate(_RUN_BREAKS)
+
 
-def generate_docx(project: dict, final_map: dict, abbr_map: dict, output_path: str) -> str:
-    """Генерирует DOCX с расшифровкой. Возвращает имя файла для скачивания."""
+def docx_download_name(original_filename: str) -> str:
+    """Имя DOCX-файла для скачивания по имени исходника."""
+    return strip_extension(original_filename) + ".docx"
+
+
+def generate_docx(project: dict, final_map: dict, abbr_map: dict, output_path: str | IO[bytes]) -> str:
+    """Генерирует DOCX с расшифровкой в файл или поток. Возвращает имя файла для скачивания."""
     doc = Document()
 
     # Настройка стилей
@@ -52,22 +80,29 @@ def generate_docx(project: dict, final_map: dict, abbr_map: dict, output_path: s
     separator.add_run("— " * 20)
     doc.add_paragraph()
 
-    # Сегменты расшифровки
+    # Сегменты расшифровки: тысячи абзацев собираются одной XML-строкой и
+    # разбираются за один проход вместо add_paragraph/add_run на каждый
     segments = project["result"]["segments"]
-    for seg in segments:
-        speaker_name = final_map.get(seg["speaker"], f"Спикер {seg['speaker']}")
-        abbr = abbr_map.get(seg["speaker"], "")
-        display_name = abbr if abbr else speaker_name
-
-        p = doc.add_paragraph()
-        tc_run = p.add_run(f"{seg['timecode']} ")
-        tc_run.font.size = Pt(10)
-        tc_run.font.color.rgb = None
-
-        name_run = p.add_run(f"{display_name}: ")
-        name_run.bold = True
-
-        p.add_run(seg["text"])
+    # Подпись считается один раз на спикера, а не на каждый сегмент
+    label_by_speaker = {
+        sp: _run_text(f"{abbr_map.get(sp) or final_map.get(sp, f'Спикер {sp}')}: ")
+        for sp in {seg["speaker"] for seg in segments}
+    }
+    segments_xml = "".join(
+        _SEGMENT_XML.format(
+            timecode=escape(seg["timecode"]),
+            label=label_by_speaker[seg["speaker"]],
+            text=_run_text(seg["text"]),
+        )
+        for seg in segments
+    )
+    body = doc.element.body
+    sect_pr = body.sectPr
+    for p in parse_xml(f"<w:body {nsdecls('w')}>{segments_xml}</w:body>"):
+        if sect_pr is not None:
+            sect_pr.addprevious(p)
+        else:
+            body.append(p)
 
     # Номера страниц (вставляем XML-поле PAGE для автонумерации)
     for section in doc.sections:
@@ -88,5 +123,4 @@ def generate_docx(project: dict, final_map: dict, abbr_map: dict, output_path: s
 
     doc.save(output_path)
 
-    download_name = strip_extension(original_filename) + ".docx"
-    return download_name
+    return docx_download_name(original_filename)
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from enum import Enum
 from typing import List, Optional
 
@@ -99,3 +100,21 @@ class BatchStatusResponse(BaseModel):
     errors: int
     in_progress: int
     files: List[BatchFileStatus]
+
+
+# --- Recognition (internal, not part of the API) ---
+
+@dataclass(slots=True)
+class RecognizedWord:
+    text: str
+    start_ms: int
+    end_ms: int
+
+
+@dataclass(slots=True)
+class RecognizedSegment:
+    text: str
+    channel_tag: int
+    start_ms: int
+    end_ms: int
+    words: list[RecognizedWord]
@@ -1,15 +1,15 @@
 import asyncio
-import os
 import time
 import uuid
 import zipfile
 from io import BytesIO
 from pathlib import Path
 from typing import List
+from urllib.parse import quote
 
 import aiofiles
-from fastapi import APIRouter, BackgroundTasks, Form, HTTPException, Query, Request, UploadFile
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -32,6 +32,7 @@ from backend.services import (
     process_uploaded_file_task,
     process_video_task,
     projects_db,
+    submit_task,
 )
 from backend.utils import sanitize_filename, validate_file_extension, validate_url
 
@@ -44,7 +45,7 @@ batches_db: dict = {}
 
 @router.post("/projects", response_model=CreateProjectResponse)
 @limiter.limit("5/minute")
-async def create_project(request: Request, req: CreateProjectRequest, background_tasks: BackgroundTasks):
+async def create_project(request: Request, req: CreateProjectRequest):
     """Создает проект и запускает фоновую обработку."""
     url_error = validate_url(req.url)
     if url_error:
@@ -56,7 +57,7 @@ async def create_project(request: Request, req: CreateProjectRequest, background
         "status": ProjectStatusEnum.QUEUED,
         "created_at": time.time(),
     }
-    background_tasks.add_task(process_video_task, pid, req.url)
+    submit_task(process_video_task, pid, req.url)
     logger.info("Проект создан: %s для URL: %s", pid[:8], req.url[:60])
     return CreateProjectResponse(id=pid)
 
@@ -87,9 +88,17 @@ async def get_result(pid: str):
     return proj["result"]
 
 
+def _attachment_disposition(filename: str) -> str:
+    """Content-Disposition для скачивания; кириллица кодируется по RFC 5987."""
+    quoted = quote(filename)
+    if quoted == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename*=utf-8''{quoted}"
+
+
 @router.post("/projects/{pid}/export")
-async def export_docx(pid: str, req: ExportRequest, background_tasks: BackgroundTasks):
-    """Генерирует DOCX-файл с транскриптом и отдает для скачивания."""
+async def export_docx(pid: str, req: ExportRequest):
+    """Генерирует DOCX-файл с транскриптом и отдает для скачивания (в памяти, без временного файла)."""
     proj = projects_db.get(pid)
     if not proj:
         raise HTTPException(status_code=404, detail="Проект не найден")
@@ -99,15 +108,14 @@ async def export_docx(pid: str, req: ExportRequest, background_tasks: Background
     final_map = {m.speaker_label: m.mapped_name for m in req.mappings}
     abbr_map = {m.speaker_label: m.abbreviation for m in req.mappings}
 
-    output_path = str(TEMP_DIR / f"transcript_{pid}.docx")
-    download_name = generate_docx(proj, final_map, abbr_map, output_path)
-
-    background_tasks.add_task(os.unlink, output_path)
+    buffer = BytesIO()
+    download_name = generate_docx(proj, final_map, abbr_map, buffer)
 
-    return FileResponse(
-        path=output_path,
-        filename=download_name,
+    # Документ уже в памяти: один ответ с Content-Length вместо построчной итерации BytesIO
+    return Response(
+        content=buffer.getvalue(),
         media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        headers={"Content-Disposition": _attachment_disposition(download_name)},
     )
 
 
@@ -117,7 +125,6 @@ async def export_docx(pid: str, req: ExportRequest, background_tasks: Background
 @router.post("/batch/upload", response_model=CreateProjectResponse)
 async def upload_file(
     file: UploadFile,
-    background_tasks: BackgroundTasks,
     engine: str = Form("whisper"),
     whisper_model: str = Form("medium"),
 ):
@@ -163,7 +170,7 @@ async def upload_file(
         "engine": engine,
     }
 
-    background_tasks.add_task(
+    submit_task(
         process_uploaded_file_task, pid, str(local_path), safe_filename,
         engine=engine, whisper_model=whisper_model,
     )
@@ -235,18 +242,11 @@ async def batch_download(ids: str = Query(..., description="ID проектов
             if not proj or proj.get("status") != ProjectStatusEnum.COMPLETED:
                 continue
 
-            output_path = str(TEMP_DIR / f"batch_export_{pid}.docx")
-            try:
-                download_name = auto_export_project(pid, output_path)
-                if download_name and os.path.exists(output_path):
-                    zf.write(output_path, download_name)
-                    exported_count += 1
-            finally:
-                try:
-                    if os.path.exists(output_path):
-                        os.unlink(output_path)
-                except OSError:
-                    pass
+            docx_buffer = BytesIO()
+            download_name = auto_export_project(pid, docx_buffer)
+            if download_name:
+                zf.writestr(download_name, docx_buffer.getvalue())
+                exported_count += 1
 
     if exported_count == 0:
         raise HTTPException(status_code=400, detail="Нет завершённых проектов для экспорта")
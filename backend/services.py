@@ -1,46 +1,106 @@
+import functools
 import hashlib
+import os
 import shutil
+import subprocess
+import tempfile
 import threading
 import time
 import urllib.error
 import urllib.request
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from operator import itemgetter
 from pathlib import Path
+from typing import IO
 
 import ffmpeg
 import grpc
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from backend.config import (
+    MAX_CONCURRENT_IO_TASKS,
     MAX_CONCURRENT_TASKS,
     MAX_FILE_SIZE_BYTES,
+    MAX_STORED_PROJECTS,
     OUTPUT_DIR,
+    SPEECHKIT_GRPC_COMPRESS,
     TEMP_DIR,
+    WHISPER_CPU_THREADS,
+    YADISK_DOWNLOAD_PARTS,
     YANDEX_API_KEY,
     logger,
 )
-from backend.models import ProjectStatusEnum
+from backend.models import ProjectStatusEnum, RecognizedSegment, RecognizedWord
+from backend.store import ProjectStore
 from backend.utils import (
     detect_fps,
     frames_to_tc,
+    is_mono_opus_audio,
     parse_filename_metadata,
+    probe_media,
     strip_extension,
     tc_to_frames,
     validate_file_extension,
 )
 
-# --- In-memory storage ---
-projects_db: dict = {}
+# Semaphores for sync background tasks: CPU-bound stages (ffmpeg, Whisper) are
+# limited tightly, network-bound stages (download, SpeechKit stream) more loosely
+_cpu_semaphore = threading.Semaphore(MAX_CONCURRENT_TASKS)
+_io_semaphore = threading.Semaphore(MAX_CONCURRENT_IO_TASKS)
 
-# Semaphore to limit concurrent heavy tasks (threading-based for sync background tasks)
-_task_semaphore = threading.Semaphore(MAX_CONCURRENT_TASKS)
+# Dedicated worker pool for pipeline tasks: long jobs do not occupy Starlette's
+# shared threadpool. A job waiting on _cpu_semaphore still holds a worker, so the
+# pool has room for a full set of I/O jobs on top of the CPU-bound ones.
+# Created on first submit, shut down in lifespan.
+_task_executor: ThreadPoolExecutor | None = None
+_task_executor_lock = threading.Lock()
 
 # TTL for completed projects (seconds) — cleaned up periodically
 PROJECT_TTL_SECONDS = 6 * 3600  # 6 hours
+PROJECT_TTL_CHECK_INTERVAL = 300  # seconds between TTL sweeps
+_ttl_stop_event: threading.Event | None = None
+
+# --- In-memory storage ---
+projects_db = ProjectStore(ttl_seconds=PROJECT_TTL_SECONDS, max_projects=MAX_STORED_PROJECTS)
 
 # --- SpeechKit gRPC v3 ---
 SPEECHKIT_GRPC_HOST = "stt.api.cloud.yandex.net:443"
-GRPC_CHUNK_SIZE = 4000  # 4 KB chunks for streaming audio
+GRPC_CHUNK_SIZE = 32000  # 32 KB chunks for streaming audio (below gRPC 64 KB buffer tier)
 GRPC_TIMEOUT = 7200  # 2 hours max for recognition
+# Auth metadata is identical for every stream: build the tuple once
+_SPEECHKIT_METADATA = (("authorization", f"Api-Key {YANDEX_API_KEY}"),)
+OPUS_BITRATE = "24k"  # speech-only encode for SpeechKit
+# Larger HTTP/2 windows keep long uploads bandwidth-bound; keepalive detects dead links
+GRPC_CHANNEL_OPTIONS = [
+    ("grpc.http2.lookahead_bytes", 8 * 1024 * 1024),
+    ("grpc.http2.max_frame_size", 1024 * 1024),
+    ("grpc.max_send_message_length", -1),
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.http2.min_time_between_pings_ms", 10000),
+]
+
+# --- HTTP (Yandex.Disk) ---
+YADISK_DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB chunks for source video download
+YADISK_DOWNLOAD_PART_SIZE = 16 * 1024 * 1024  # 16 MiB per Range request (work-queue unit)
+PROGRESS_UPDATE_INTERVAL = 0.25  # s, min gap between progress_percent writes
+
+# Shared session: keep-alive connections are reused across API calls and downloads;
+# transient API/CDN failures (429, 5xx, dropped connects) are retried with backoff
+_http_session = requests.Session()
+_http_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        # each concurrent ranged download holds up to YADISK_DOWNLOAD_PARTS CDN connections
+        pool_maxsize=MAX_CONCURRENT_IO_TASKS * YADISK_DOWNLOAD_PARTS,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504)),
+    ),
+)
 
 # --- Whisper (local) ---
 try:
@@ -56,66 +116,182 @@ _whisper_lock = threading.Lock()
 
 
 def _download_from_yadisk(project_id: str, disk_url: str, local_video_path) -> str:
-    """Скачивает файл с Яндекс.Диска. Возвращает оригинальное имя файла."""
-    api_url = "https://cloud-api.yandex.net/v1/disk/public/resources/download"
-    resp = requests.get(api_url, params={"public_key": disk_url}, timeout=30)
+    """Скачивает файл с Яндекс.Диска. Возвращает оригинальное имя файла.
+
+    Имя, размер и прямая ссылка на скачивание берутся одним запросом к /resources.
+    """
+    api_url = "https://cloud-api.yandex.net/v1/disk/public/resources"
+    resp = _http_session.get(
+        api_url, params={"public_key": disk_url, "fields": "name,size,file"}, timeout=30,
+    )
     resp.raise_for_status()
-    download_url = resp.json()["href"]
+    meta_data = resp.json()
+
+    original_filename = meta_data.get("name") or "video_source.mp4"
+    file_size = meta_data.get("size", 0)
+    if file_size > MAX_FILE_SIZE_BYTES:
+        raise ValueError(
+            f"Файл слишком большой ({file_size / (1024**3):.1f} ГБ). "
+            f"Максимум: {MAX_FILE_SIZE_BYTES / (1024**3):.0f} ГБ."
+        )
 
-    original_filename = "video_source.mp4"
-    try:
-        meta_url = "https://cloud-api.yandex.net/v1/disk/public/resources"
-        meta_resp = requests.get(meta_url, params={"public_key": disk_url}, timeout=15)
-        if meta_resp.status_code == 200:
-            meta_data = meta_resp.json()
-            original_filename = meta_data.get("name", original_filename)
-            file_size = meta_data.get("size", 0)
-            if file_size > MAX_FILE_SIZE_BYTES:
-                raise ValueError(
-                    f"Файл слишком большой ({file_size / (1024**3):.1f} ГБ). "
-                    f"Максимум: {MAX_FILE_SIZE_BYTES / (1024**3):.0f} ГБ."
-                )
-    except requests.RequestException as e:
-        logger.warning("[%s] Не удалось получить метаданные файла: %s", project_id[:8], e)
+    download_url = meta_data.get("file")
+    if not download_url:
+        # Нет прямой ссылки (например, публичная папка) — просим её у /download
+        dl_resp = _http_session.get(f"{api_url}/download", params={"public_key": disk_url}, timeout=30)
+        dl_resp.raise_for_status()
+        download_url = dl_resp.json()["href"]
 
     ext_error = validate_file_extension(original_filename)
     if ext_error:
         raise ValueError(ext_error)
 
-    downloaded_size = 0
-    with requests.get(download_url, stream=True, timeout=600) as r:
+    # Размер известен из метаданных — качаем частями параллельно;
+    # если сервер не поддержал Range, падаем обратно на один поток
+    ranged = (
+        YADISK_DOWNLOAD_PARTS > 1
+        and hasattr(os, "pwrite")
+        and file_size > YADISK_DOWNLOAD_PART_SIZE
+        and _download_ranged(project_id, download_url, local_video_path, file_size)
+    )
+    if not ranged:
+        _download_single(project_id, download_url, local_video_path)
+
+    logger.info("[%s] Файл скачан: %s", project_id[:8], original_filename)
+    return original_filename
+
+
+class _DownloadProgress:
+    """Счётчик скачанных байт. Пишет progress_percent в projects_db
+    не чаще раза в PROGRESS_UPDATE_INTERVAL, а не на каждый чанк."""
+
+    def __init__(self, project_id: str, total_size: int):
+        self.project_id = project_id
+        self.total_size = total_size
+        self._done = 0
+        self._last_update = float("-inf")  # first chunk is always reported
+        self._lock = threading.Lock()
+
+    def add(self, n: int):
+        if self.total_size <= 0:
+            return
+        with self._lock:
+            self._done += n
+            now = time.monotonic()
+            finished = self._done >= self.total_size
+            if not finished and now - self._last_update < PROGRESS_UPDATE_INTERVAL:
+                return
+            self._last_update = now
+            pct = min(self._done * 100 // self.total_size, 100)
+            # Под своей блокировкой: иначе запоздавшая запись 90 может перезаписать финальные 100
+            projects_db.update(self.project_id, progress_percent=pct)
+
+
+def _download_single(project_id: str, download_url: str, local_video_path):
+    """Скачивает файл одним потоком."""
+    with _http_session.get(download_url, stream=True, timeout=600) as r:
         r.raise_for_status()
-        content_length = int(r.headers.get("content-length", 0))
+        progress = _DownloadProgress(project_id, int(r.headers.get("content-length", 0)))
         with open(local_video_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=65536):
+            for chunk in r.iter_content(chunk_size=YADISK_DOWNLOAD_CHUNK_SIZE):
                 f.write(chunk)
-                downloaded_size += len(chunk)
-                if content_length > 0:
-                    pct = min(int(downloaded_size / content_length * 100), 100)
-                    projects_db[project_id]["progress_percent"] = pct
+                progress.add(len(chunk))
 
-    logger.info("[%s] Файл скачан: %s", project_id[:8], original_filename)
-    return original_filename
 
+def _download_ranged(project_id: str, download_url: str, local_video_path, total_size: int) -> bool:
+    """Скачивает файл параллельными Range-запросами, каждый пишет в свой участок файла.
+
+    Файл делится на части по YADISK_DOWNLOAD_PART_SIZE, которые разбирают
+    YADISK_DOWNLOAD_PARTS потоков: медленное соединение задерживает только
+    свою часть, а не четверть файла. Файл заранее выделяется на полный размер.
 
-def _convert_to_opus(project_id: str, input_path, output_path):
-    """Конвертирует видео/аудио в OPUS."""
-    logger.info("[%s] Конвертация в OPUS...", project_id[:8])
-    (
+    Возвращает False, если сервер ответил 200 вместо 206 (Range не поддерживается).
+    Ошибка любой части останавливает остальные и пробрасывается наружу.
+    """
+    part_size = YADISK_DOWNLOAD_PART_SIZE
+    ranges = [(lo, min(lo + part_size, total_size) - 1) for lo in range(0, total_size, part_size)]
+    progress = _DownloadProgress(project_id, total_size)
+    range_unsupported = threading.Event()
+    # Взводится при ошибке или отказе от Range: очередь частей не докачивается впустую
+    abort = threading.Event()
+
+    def fetch(byte_range: tuple[int, int]) -> bool:
+        if abort.is_set():
+            return False
+        lo, hi = byte_range
+        headers = {"Range": f"bytes={lo}-{hi}"}
+        try:
+            with _http_session.get(download_url, headers=headers, stream=True, timeout=600) as r:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    range_unsupported.set()
+                    abort.set()
+                    return False
+                offset = lo
+                for chunk in r.iter_content(chunk_size=YADISK_DOWNLOAD_CHUNK_SIZE):
+                    if abort.is_set():
+                        return False
+                    os.pwrite(fd, chunk, offset)
+                    offset += len(chunk)
+                    progress.add(len(chunk))
+            if offset != hi + 1:
+                raise OSError(f"Неполная часть файла: байты {lo}-{hi}, получено {offset - lo}")
+        except Exception:
+            abort.set()
+            raise
+        return True
+
+    fd = os.open(local_video_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, total_size)
+        workers = min(YADISK_DOWNLOAD_PARTS, len(ranges))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="abtgs-dl") as pool:
+            # Результаты не нужны: list() дожидается частей и пробрасывает ошибку любой из них
+            list(pool.map(fetch, ranges))
+    finally:
+        os.close(fd)
+
+    if range_unsupported.is_set():
+        logger.info("[%s] Сервер не поддерживает Range, скачивание одним потоком", project_id[:8])
+        return False
+    return True
+
+
+def _start_opus_stream(project_id: str, input_path, probe: dict | None = None) -> subprocess.Popen:
+    """Запускает ffmpeg, который пишет OGG/OPUS в stdout (без временного файла).
+
+    Если исходник уже содержит OPUS моно, дорожка копируется без перекодирования.
+    """
+    if is_mono_opus_audio(probe):
+        logger.info("[%s] Исходник уже в OPUS — копирование дорожки в SpeechKit...", project_id[:8])
+        audio_opts = {"acodec": "copy"}
+    else:
+        logger.info("[%s] Конвертация в OPUS (потоком в SpeechKit)...", project_id[:8])
+        # Для распознавания речи 24 кбит/с VOIP-профиля достаточно (дефолт libopus ~96 кбит/с)
+        audio_opts = {
+            "acodec": "libopus", "ac": 1, "ar": 48000,
+            "audio_bitrate": OPUS_BITRATE, "application": "voip",
+        }
+    args = (
         ffmpeg
         .input(str(input_path))
-        .output(str(output_path), acodec="libopus", ac=1, ar=48000)
-        .overwrite_output()
-        .run(quiet=True)
+        .output("pipe:1", format="ogg", vn=None, **audio_opts)
+        .global_args("-hide_banner", "-nostats", "-loglevel", "error")
+        .compile()
     )
-    logger.info("[%s] Конвертация завершена.", project_id[:8])
+    return subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
 
 
 # ==================== SpeechKit API v3 (gRPC) ====================
 
 
-def _generate_recognition_requests(audio_path):
-    """Генератор gRPC-запросов: сначала настройки сессии, затем чанки аудио."""
+@functools.lru_cache(maxsize=None)
+def _session_options_request():
+    """Собирает запрос с настройками сессии SpeechKit (один раз на процесс).
+
+    Настройки одинаковы для всех распознаваний, поэтому protobuf-сообщение
+    создаётся единожды и переиспользуется всеми стримами.
+    """
     from yandex.cloud.ai.stt.v3 import stt_pb2
 
     recognize_options = stt_pb2.StreamingOptions(
@@ -141,22 +317,32 @@ def _generate_recognition_requests(audio_path):
             speaker_labeling=stt_pb2.SpeakerLabelingOptions.SPEAKER_LABELING_ENABLED,
         ),
     )
-    yield stt_pb2.StreamingRequest(session_options=recognize_options)
+    return stt_pb2.StreamingRequest(session_options=recognize_options)
+
+
+def _audio_chunk_requests(f):
+    """Нарезает бинарный поток на gRPC-запросы с чанками аудио."""
+    from yandex.cloud.ai.stt.v3 import stt_pb2
+
+    for data in iter(lambda: f.read(GRPC_CHUNK_SIZE), b""):
+        yield stt_pb2.StreamingRequest(chunk=stt_pb2.AudioChunk(data=data))
 
-    # Stream audio file in chunks
-    with open(str(audio_path), "rb") as f:
-        while True:
-            data = f.read(GRPC_CHUNK_SIZE)
-            if not data:
-                break
-            yield stt_pb2.StreamingRequest(chunk=stt_pb2.AudioChunk(data=data))
 
+def _generate_recognition_requests(audio):
+    """Генератор gRPC-запросов: сначала настройки сессии, затем чанки аудио.
 
-def _transcribe_with_speechkit(project_id: str, audio_path) -> list[dict]:
+    audio — бинарный поток с OPUS (stdout ffmpeg).
+    """
+    yield _session_options_request()
+    yield from _audio_chunk_requests(audio)
+
+
+def _transcribe_with_speechkit(project_id: str, audio) -> Iterator[RecognizedSegment]:
     """Распознавание через SpeechKit API v3 (gRPC) с диаризацией спикеров.
 
-    Стримит локальный аудиофайл напрямую в SpeechKit (S3 не нужен).
-    Возвращает список сегментов с channel_tag (0 или 1) для каждого спикера.
+    Стримит OPUS из stdout ffmpeg напрямую в SpeechKit (S3 не нужен).
+    Генератор: отдаёт сегменты с channel_tag (0 или 1) по мере получения
+    ответов, не накапливая весь транскрипт в памяти.
     """
     if not YANDEX_API_KEY:
         raise RuntimeError("YANDEX_API_KEY не задан. Распознавание невозможно.")
@@ -164,50 +350,48 @@ def _transcribe_with_speechkit(project_id: str, audio_path) -> list[dict]:
     from yandex.cloud.ai.stt.v3 import stt_service_pb2_grpc
 
     cred = grpc.ssl_channel_credentials()
-    channel = grpc.secure_channel(SPEECHKIT_GRPC_HOST, cred)
+    compression = grpc.Compression.Gzip if SPEECHKIT_GRPC_COMPRESS else grpc.Compression.NoCompression
+    channel = grpc.secure_channel(
+        SPEECHKIT_GRPC_HOST, cred, options=GRPC_CHANNEL_OPTIONS, compression=compression,
+    )
     stub = stt_service_pb2_grpc.RecognizerStub(channel)
 
     logger.info("[%s] Стримим аудио в SpeechKit v3 (gRPC с диаризацией)...", project_id[:8])
 
     try:
         responses = stub.RecognizeStreaming(
-            _generate_recognition_requests(audio_path),
-            metadata=[("authorization", f"Api-Key {YANDEX_API_KEY}")],
+            _generate_recognition_requests(audio),
+            metadata=_SPEECHKIT_METADATA,
             timeout=GRPC_TIMEOUT,
         )
 
-        segments = []
+        count = 0
+        # Локальные ссылки: на длинной записи ответов тысячи, а слов — сотни тысяч
+        make_word = RecognizedWord
+        make_segment = RecognizedSegment
         for r in responses:
-            event_type = r.WhichOneof("Event")
-            if event_type == "final_refinement":
-                alts = r.final_refinement.normalized_text.alternatives
-                if not alts:
-                    continue
-                alt = alts[0]
-                text = alt.text
-                words = list(alt.words)
-                if not words:
-                    continue
-                segments.append({
-                    "text": text,
-                    "channel_tag": r.channel_tag,
-                    "start_ms": words[0].start_time_ms,
-                    "end_ms": words[-1].end_time_ms,
-                    "words": [
-                        {
-                            "text": w.text,
-                            "start_ms": w.start_time_ms,
-                            "end_ms": w.end_time_ms,
-                        }
-                        for w in words
-                    ],
-                })
+            if r.WhichOneof("Event") != "final_refinement":
+                continue
+            alts = r.final_refinement.normalized_text.alternatives
+            if not alts:
+                continue
+            alt = alts[0]
+            words = [make_word(w.text, w.start_time_ms, w.end_time_ms) for w in alt.words]
+            if not words:
+                continue
+            count += 1
+            yield make_segment(
+                text=alt.text,
+                channel_tag=r.channel_tag,
+                start_ms=words[0].start_ms,
+                end_ms=words[-1].end_ms,
+                words=words,
+            )
 
         logger.info(
             "[%s] Распознавание завершено. Сегментов: %d",
-            project_id[:8], len(segments),
+            project_id[:8], count,
         )
-        return segments
 
     except grpc.RpcError as e:
         logger.error(
@@ -219,6 +403,30 @@ def _transcribe_with_speechkit(project_id: str, audio_path) -> list[dict]:
         channel.close()
 
 
+def _transcribe_media_with_speechkit(
+    project_id: str, input_path, probe: dict | None = None,
+) -> Iterator[RecognizedSegment]:
+    """Конвейер конвертации и распознавания: ffmpeg -> pipe -> SpeechKit.
+
+    SpeechKit получает аудио по мере кодирования, поэтому конвертация
+    и отправка идут параллельно, а OPUS-файл на диске не создаётся.
+    Генератор: ffmpeg запускается при первом запросе сегмента.
+    """
+    proc = _start_opus_stream(project_id, input_path, probe)
+    try:
+        yield from _transcribe_with_speechkit(project_id, proc.stdout)
+    except (Exception, GeneratorExit):
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        proc.stdout.close()
+
+    if proc.wait() != 0:
+        raise RuntimeError(f"FFmpeg завершился с кодом {proc.returncode} при конвертации в OPUS")
+    logger.info("[%s] Конвертация завершена.", project_id[:8])
+
+
 # ==================== Whisper (local, free) ====================
 
 
@@ -232,7 +440,7 @@ def _get_whisper_cache_dir() -> Path:
 # Max retries for each chunk/resume attempt during download
 DOWNLOAD_MAX_RETRIES = 10
 DOWNLOAD_RETRY_DELAY = 5  # seconds between resume attempts
-DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB chunks
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # 4 MB chunks
 
 
 def _download_whisper_model_resumable(url: str, target_path: Path, expected_sha256: str):
@@ -282,18 +490,20 @@ def _download_whisper_model_resumable(url: str, target_path: Path, expected_sha2
                 total_mb = total_size / (1024 * 1024) if total_size else 0
 
                 mode = "ab" if downloaded > 0 and response.status == 206 else "wb"
+                last_decile = downloaded * 10 // total_size if total_size else 0
                 with open(temp_path, mode) as f:
-                    while True:
-                        chunk = response.read(DOWNLOAD_CHUNK_SIZE)
-                        if not chunk:
-                            break
+                    for chunk in iter(lambda: response.read(DOWNLOAD_CHUNK_SIZE), b""):
                         f.write(chunk)
                         downloaded += len(chunk)
                         if total_size > 0:
-                            pct = int(downloaded / total_size * 100)
-                            dl_mb = downloaded / (1024 * 1024)
-                            if pct % 10 == 0:
-                                logger.info("  %d%% (%d / %d МБ)", pct, int(dl_mb), int(total_mb))
+                            # Log once per 10% band, not on every chunk inside it
+                            decile = downloaded * 10 // total_size
+                            if decile != last_decile:
+                                last_decile = decile
+                                logger.info(
+                                    "  %d%% (%d / %d МБ)",
+                                    downloaded * 100 // total_size, downloaded // (1024 * 1024), int(total_mb),
+                                )
 
             # Download complete — verify SHA256
             logger.info("Скачивание завершено. Проверка SHA256...")
@@ -395,6 +605,10 @@ def get_whisper_model(model_name: str = "medium"):
         _ensure_whisper_model_downloaded(model_name)
 
         # Step 2: Load model into memory
+        # Без ограничения каждая из параллельных задач берёт все ядра (N × cpu_count потоков)
+        import torch
+        torch.set_num_threads(WHISPER_CPU_THREADS)
+
         logger.info("Загрузка модели Whisper '%s' в память...", model_name)
         _whisper_model = whisper_module.load_model(model_name)
         _whisper_model_name = model_name
@@ -402,7 +616,24 @@ def get_whisper_model(model_name: str = "medium"):
         return _whisper_model
 
 
-def _transcribe_with_whisper(project_id: str, file_path, model_name: str = "medium") -> list[dict]:
+def warmup_whisper_model(model_name: str = "medium"):
+    """Загружает модель Whisper заранее и прогревает её на секунде тишины.
+
+    Запускается при старте сервера в фоновом потоке, чтобы первый запрос
+    не ждал загрузки модели. Ошибки только логируются.
+    """
+    try:
+        import numpy as np
+
+        model = get_whisper_model(model_name)
+        silence = np.zeros(whisper_module.audio.SAMPLE_RATE, dtype=np.float32)
+        model.transcribe(silence, language="ru", verbose=None)
+        logger.info("Модель Whisper '%s' прогрета.", model_name)
+    except Exception as e:
+        logger.warning("Не удалось прогреть модель Whisper '%s': %s", model_name, e)
+
+
+def _transcribe_with_whisper(project_id: str, file_path, model_name: str = "medium") -> list[RecognizedSegment]:
     """Распознавание через Whisper (локально, бесплатно).
 
     Принимает любой аудио/видео файл (Whisper использует ffmpeg внутри).
@@ -425,81 +656,93 @@ def _transcribe_with_whisper(project_id: str, file_path, model_name: str = "medi
         if not text:
             continue
 
-        words = []
-        for w in seg.get("words", []):
-            words.append({
-                "text": w["word"].strip(),
-                "start_ms": int(w["start"] * 1000),
-                "end_ms": int(w["end"] * 1000),
-            })
-
-        segments.append({
-            "text": text,
-            "channel_tag": 0,
-            "start_ms": int(seg["start"] * 1000),
-            "end_ms": int(seg["end"] * 1000),
-            "words": words if words else [
-                {"text": text, "start_ms": int(seg["start"] * 1000), "end_ms": int(seg["end"] * 1000)}
-            ],
-        })
+        start_ms = int(seg["start"] * 1000)
+        end_ms = int(seg["end"] * 1000)
+        words = [
+            RecognizedWord(w["word"].strip(), int(w["start"] * 1000), int(w["end"] * 1000))
+            for w in seg.get("words", [])
+        ]
+
+        segments.append(RecognizedSegment(
+            text=text,
+            channel_tag=0,
+            start_ms=start_ms,
+            end_ms=end_ms,
+            words=words or [RecognizedWord(text, start_ms, end_ms)],
+        ))
 
     logger.info("[%s] Whisper: %d сегментов", project_id[:8], len(segments))
     return segments
 
 
-def _process_recognition_result(project_id: str, segments: list[dict], original_filename: str, video_path):
-    """Обрабатывает результат распознавания v3 и сохраняет в projects_db."""
+def _process_recognition_result(
+    project_id: str,
+    segments: Iterable[RecognizedSegment],
+    original_filename: str,
+    video_path,
+    probe: dict | None = None,
+):
+    """Обрабатывает результат распознавания v3 и сохраняет в projects_db.
+
+    segments может быть генератором: сегменты обрабатываются по одному
+    по мере поступления из распознавателя. probe — результат probe_media
+    для исходника (чтобы не запускать ffprobe повторно).
+    """
     meta = parse_filename_metadata(original_filename)
-    projects_db[project_id]["original_filename"] = original_filename
+    projects_db.update(project_id, original_filename=original_filename)
 
-    fps = detect_fps(str(video_path)) if video_path.exists() else 25
+    fps = detect_fps(str(video_path), probe) if video_path.exists() else 25
 
-    speaker_durations: dict[str, float] = {}
+    speaker_durations: defaultdict[str, int] = defaultdict(int)  # ms
     raw_segments = []
     start_frames = tc_to_frames(meta["start_tc"], fps)
 
+    # Локальные ссылки: цикл идёт по тысячам сегментов длинной расшифровки
+    to_tc = frames_to_tc
+    add_segment = raw_segments.append
+
     for seg in segments:
-        channel = str(seg["channel_tag"])
-        text = seg["text"]
-        words = seg["words"]
+        channel = str(seg.channel_tag)
+        words = seg.words
         if not words:
             continue
 
-        start_s = words[0]["start_ms"] / 1000.0
-        end_s = words[-1]["end_ms"] / 1000.0
-
-        dur = end_s - start_s
-        speaker_durations[channel] = speaker_durations.get(channel, 0) + dur
+        start_ms = words[0].start_ms
+        end_ms = words[-1].end_ms
 
-        abs_frames = start_frames + int(start_s * fps)
-        tc_formatted = frames_to_tc(abs_frames, fps)
+        speaker_durations[channel] += end_ms - start_ms
 
-        raw_segments.append({
-            "timecode": tc_formatted,
+        # Integer math: exact frame index without float rounding (1160 ms -> 29, not 28)
+        abs_frames = start_frames + start_ms * fps // 1000
+        add_segment({
+            "timecode": to_tc(abs_frames, fps),
             "speaker": channel,
-            "text": text,
+            "text": seg.text,
         })
 
     detected_speakers = {}
-    sorted_voices = sorted(speaker_durations.items(), key=lambda x: x[1], reverse=True)
+    sorted_voices = sorted(speaker_durations.items(), key=itemgetter(1), reverse=True)
     file_names = meta["speakers"]
 
-    for i, (voice_id, dur) in enumerate(sorted_voices):
+    for i, (voice_id, dur_ms) in enumerate(sorted_voices):
         suggested = f"Спикер {voice_id}"
         if i < len(file_names):
             suggested = file_names[i]
 
         detected_speakers[voice_id] = {
-            "duration_sec": round(dur, 1),
+            "duration_sec": round(dur_ms / 1000, 1),
             "suggested_name": suggested,
         }
 
-    projects_db[project_id]["result"] = {
-        "segments": raw_segments,
-        "speakers": detected_speakers,
-        "meta": {**meta, "original_filename": original_filename},
-    }
-    projects_db[project_id]["fps"] = fps
+    projects_db.update(
+        project_id,
+        result={
+            "segments": raw_segments,
+            "speakers": detected_speakers,
+            "meta": {**meta, "original_filename": original_filename},
+        },
+        fps=fps,
+    )
 
     logger.info(
         "[%s] Обработка завершена. Сегментов: %d, Спикеров: %d, FPS: %d",
@@ -510,64 +753,104 @@ def _process_recognition_result(project_id: str, segments: list[dict], original_
 # ==================== Task functions ====================
 
 
+def submit_task(fn, *args, **kwargs) -> Future:
+    """Ставит фоновую задачу обработки в пул воркеров."""
+    global _task_executor
+    with _task_executor_lock:
+        if _task_executor is None:
+            _task_executor = ThreadPoolExecutor(
+                max_workers=MAX_CONCURRENT_IO_TASKS + MAX_CONCURRENT_TASKS,
+                thread_name_prefix="abtgs-task",
+            )
+        return _task_executor.submit(fn, *args, **kwargs)
+
+
+def shutdown_task_executor():
+    """Отменяет задачи в очереди и ждёт завершения уже запущенных (при остановке сервера)."""
+    global _task_executor
+    with _task_executor_lock:
+        executor, _task_executor = _task_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
 def _cleanup_old_projects():
     """Удаляет завершённые/ошибочные проекты старше PROJECT_TTL_SECONDS."""
-    now = time.time()
-    to_delete = []
-    for pid, proj in projects_db.items():
-        status = proj.get("status")
-        if status in (ProjectStatusEnum.COMPLETED, ProjectStatusEnum.ERROR):
-            created = proj.get("created_at", now)
-            if now - created > PROJECT_TTL_SECONDS:
-                to_delete.append(pid)
-    for pid in to_delete:
-        del projects_db[pid]
-    if to_delete:
-        logger.info("TTL-очистка: удалено %d старых проектов", len(to_delete))
+    removed = projects_db.expire()
+    if removed:
+        logger.info("TTL-очистка: удалено %d старых проектов", removed)
 
 
-def process_video_task(project_id: str, disk_url: str):
-    """Фоновая задача: скачивание -> конвертация -> распознавание с диаризацией."""
-    _task_semaphore.acquire()
-    local_video_path = TEMP_DIR / f"{project_id}_video"
-    local_audio_path = TEMP_DIR / f"{project_id}.opus"
+def _ttl_loop(stop_event: threading.Event):
+    """Периодически запускает TTL-очистку, пока не выставлен stop_event."""
+    while not stop_event.wait(PROJECT_TTL_CHECK_INTERVAL):
+        try:
+            _cleanup_old_projects()
+        except Exception as e:
+            logger.warning("Ошибка TTL-очистки: %s", e)
 
-    try:
-        _cleanup_old_projects()
 
-        # 1. СКАЧИВАНИЕ
-        projects_db[project_id]["status"] = ProjectStatusEnum.DOWNLOADING
-        projects_db[project_id]["progress_percent"] = 0
-        logger.info("[%s] Скачивание файла с Яндекс.Диска...", project_id[:8])
-        original_filename = _download_from_yadisk(project_id, disk_url, local_video_path)
+def start_ttl_cleanup():
+    """Запускает фоновый поток TTL-очистки (идемпотентно)."""
+    global _ttl_stop_event
+    if _ttl_stop_event is not None:
+        return
+    _ttl_stop_event = threading.Event()
+    threading.Thread(
+        target=_ttl_loop,
+        args=(_ttl_stop_event,),
+        name="ttl-cleanup",
+        daemon=True,
+    ).start()
+
 
-        # 2. КОНВЕРТАЦИЯ
-        projects_db[project_id]["status"] = ProjectStatusEnum.CONVERTING
-        projects_db[project_id]["progress_percent"] = None
-        _convert_to_opus(project_id, local_video_path, local_audio_path)
+def stop_ttl_cleanup():
+    """Останавливает фоновый поток TTL-очистки."""
+    global _ttl_stop_event
+    if _ttl_stop_event is not None:
+        _ttl_stop_event.set()
+        _ttl_stop_event = None
 
-        # 3. РАСПОЗНАВАНИЕ (gRPC v3 с диаризацией)
-        projects_db[project_id]["status"] = ProjectStatusEnum.TRANSCRIBING
-        logger.info("[%s] Распознавание с диаризацией...", project_id[:8])
-        segments = _transcribe_with_speechkit(project_id, local_audio_path)
 
-        # 4. ОБРАБОТКА РЕЗУЛЬТАТА
-        _process_recognition_result(project_id, segments, original_filename, local_video_path)
-        projects_db[project_id]["status"] = ProjectStatusEnum.COMPLETED
+def close_http_session():
+    """Закрывает keep-alive соединения общей HTTP-сессии (при остановке сервера)."""
+    _http_session.close()
+
+
+def process_video_task(project_id: str, disk_url: str):
+    """Фоновая задача: скачивание -> конвертация -> распознавание с диаризацией.
+
+    Скачанный файл живёт во временной папке задачи, которая удаляется
+    целиком при выходе из задачи (в том числе при ошибке).
+    """
+    try:
+        with tempfile.TemporaryDirectory(dir=TEMP_DIR, prefix=f"{project_id[:8]}_") as work_dir:
+            local_video_path = Path(work_dir) / "video"
+
+            # 1. СКАЧИВАНИЕ
+            with _io_semaphore:
+                projects_db.update(project_id, status=ProjectStatusEnum.DOWNLOADING, progress_percent=0)
+                logger.info("[%s] Скачивание файла с Яндекс.Диска...", project_id[:8])
+                original_filename = _download_from_yadisk(project_id, disk_url, local_video_path)
+            probe = probe_media(local_video_path)
+
+            # 2-4. КОНВЕРТАЦИЯ + РАСПОЗНАВАНИЕ + ОБРАБОТКА
+            # (конвейер ffmpeg -> gRPC v3 с диаризацией -> сегменты по мере поступления)
+            with _cpu_semaphore, _io_semaphore:
+                projects_db.update(project_id, status=ProjectStatusEnum.TRANSCRIBING, progress_percent=None)
+                logger.info("[%s] Распознавание с диаризацией...", project_id[:8])
+                segments = _transcribe_media_with_speechkit(
+                    project_id, local_video_path, probe,
+                )
+                _process_recognition_result(project_id, segments, original_filename, local_video_path, probe)
+        projects_db.update(project_id, status=ProjectStatusEnum.COMPLETED)
 
     except Exception as e:
         logger.exception("[%s] Ошибка обработки: %s", project_id[:8], e)
-        projects_db[project_id]["status"] = ProjectStatusEnum.ERROR
-        projects_db[project_id]["error"] = str(e)
+        projects_db.update(project_id, status=ProjectStatusEnum.ERROR, error=str(e))
 
     finally:
-        _task_semaphore.release()
-        for path in (local_video_path, local_audio_path):
-            try:
-                if path.exists():
-                    path.unlink()
-            except OSError:
-                pass
+        projects_db.schedule_expiry(project_id)
 
 
 def process_uploaded_file_task(
@@ -580,35 +863,33 @@ def process_uploaded_file_task(
     """Фоновая задача для локально загруженного файла.
 
     engine='whisper': файл -> Whisper (без конвертации, бесплатно)
-    engine='speechkit': файл -> OPUS -> gRPC v3 (диаризация, платно)
+    engine='speechkit': файл -> ffmpeg (OPUS в pipe) -> gRPC v3 (диаризация, платно)
     """
-    _task_semaphore.acquire()
-    local_audio_path = TEMP_DIR / f"{project_id}.opus"
     local_video_path = Path(local_video_path)
 
     try:
-        _cleanup_old_projects()
-        projects_db[project_id]["original_filename"] = original_filename
+        projects_db.update(project_id, original_filename=original_filename)
+        probe = probe_media(local_video_path)
 
         if engine == "whisper":
             # Whisper: передаём файл напрямую (конвертация не нужна)
-            projects_db[project_id]["status"] = ProjectStatusEnum.TRANSCRIBING
-            projects_db[project_id]["progress_percent"] = None
-            logger.info("[%s] Whisper: модель %s", project_id[:8], whisper_model)
-            segments = _transcribe_with_whisper(project_id, local_video_path, whisper_model)
+            with _cpu_semaphore:
+                projects_db.update(project_id, status=ProjectStatusEnum.TRANSCRIBING, progress_percent=None)
+                logger.info("[%s] Whisper: модель %s", project_id[:8], whisper_model)
+                segments = _transcribe_with_whisper(project_id, local_video_path, whisper_model)
+            _process_recognition_result(project_id, segments, original_filename, local_video_path, probe)
         else:
-            # SpeechKit: конвертация в OPUS, затем gRPC
-            projects_db[project_id]["status"] = ProjectStatusEnum.CONVERTING
-            projects_db[project_id]["progress_percent"] = None
-            _convert_to_opus(project_id, local_video_path, local_audio_path)
-
-            projects_db[project_id]["status"] = ProjectStatusEnum.TRANSCRIBING
-            logger.info("[%s] SpeechKit v3 с диаризацией...", project_id[:8])
-            segments = _transcribe_with_speechkit(project_id, local_audio_path)
-
-        # 3. ОБРАБОТКА РЕЗУЛЬТАТА
-        _process_recognition_result(project_id, segments, original_filename, local_video_path)
-        projects_db[project_id]["status"] = ProjectStatusEnum.COMPLETED
+            # SpeechKit: конвертация в OPUS потоком прямо в gRPC,
+            # сегменты обрабатываются по мере поступления ответов
+            with _cpu_semaphore, _io_semaphore:
+                projects_db.update(project_id, status=ProjectStatusEnum.TRANSCRIBING, progress_percent=None)
+                logger.info("[%s] SpeechKit v3 с диаризацией...", project_id[:8])
+                segments = _transcribe_media_with_speechkit(
+                    project_id, local_video_path, probe,
+                )
+                _process_recognition_result(project_id, segments, original_filename, local_video_path, probe)
+
+        projects_db.update(project_id, status=ProjectStatusEnum.COMPLETED)
         logger.info("[%s] Файл обработан: %s", project_id[:8], original_filename)
 
         # 4. АВТОСОХРАНЕНИЕ DOCX НА ДИСК
@@ -620,34 +901,64 @@ def process_uploaded_file_task(
                 if final_path.exists():
                     final_path = OUTPUT_DIR / f"{strip_extension(saved_name)}_{project_id[:8]}.docx"
                 shutil.move(docx_path, str(final_path))
+                st = os.stat(final_path)
+                projects_db.update(
+                    project_id, docx_path=str(final_path), docx_stat=(st.st_size, st.st_mtime_ns),
+                )
                 logger.info("[%s] DOCX сохранён: %s", project_id[:8], final_path.name)
         except Exception as e:
             logger.warning("[%s] Не удалось автосохранить DOCX: %s", project_id[:8], e)
 
     except Exception as e:
         logger.exception("[%s] Ошибка обработки: %s", project_id[:8], e)
-        projects_db[project_id]["status"] = ProjectStatusEnum.ERROR
-        projects_db[project_id]["error"] = str(e)
+        projects_db.update(project_id, status=ProjectStatusEnum.ERROR, error=str(e))
 
     finally:
-        _task_semaphore.release()
-        for path in (local_video_path, local_audio_path):
-            try:
-                if path.exists():
-                    path.unlink()
-            except OSError:
-                pass
+        projects_db.schedule_expiry(project_id)
+        try:
+            local_video_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+def _unchanged_saved_docx(proj: dict) -> str | None:
+    """Путь к автосохранённому DOCX, если файл не менялся после сохранения.
+
+    Результат распознавания после завершения не меняется, поэтому сохранённый
+    документ актуален, пока совпадают его размер и mtime.
+    """
+    saved_path = proj.get("docx_path")
+    if not saved_path or not proj.get("docx_stat"):
+        return None
+    try:
+        st = os.stat(saved_path)
+    except OSError:
+        return None
+    return saved_path if (st.st_size, st.st_mtime_ns) == tuple(proj["docx_stat"]) else None
 
 
-def auto_export_project(project_id: str, output_path: str) -> str | None:
+def auto_export_project(project_id: str, output_path: str | IO[bytes]) -> str | None:
     """Автоматически экспортирует проект в DOCX используя имена спикеров из метаданных файла.
-    Возвращает имя файла для скачивания или None при ошибке."""
-    from backend.docx_export import generate_docx
+    Возвращает имя файла для скачивания или None при ошибке.
+
+    Если автосохранённый DOCX на месте и не изменён, файл копируется вместо
+    повторной генерации.
+    """
+    from backend.docx_export import docx_download_name, generate_docx
 
     proj = projects_db.get(project_id)
     if not proj or "result" not in proj:
         return None
 
+    saved_path = _unchanged_saved_docx(proj)
+    if saved_path:
+        if not isinstance(output_path, str):
+            with open(saved_path, "rb") as src:
+                shutil.copyfileobj(src, output_path)
+        elif saved_path != output_path:
+            shutil.copyfile(saved_path, output_path)
+        return docx_download_name(proj.get("original_filename", "transcript"))
+
     speakers = proj["result"].get("speakers", {})
     final_map = {}
     abbr_map = {}
@@ -0,0 +1,110 @@
+import heapq
+import threading
+import time
+
+STORE_SHARDS = 16  # power of two: shard index is hash(pid) & (STORE_SHARDS - 1)
+
+
+class ProjectStore:
+    """Потокобезопасное in-memory хранилище проектов с TTL.
+
+    Записи проектов — обычные dict; поля записи меняются только через
+    update(), под блокировкой шарда. Коллекция разбита на шарды, у каждого
+    своя блокировка: задачи и HTTP-запросы по разным проектам не ждут
+    друг друга. Удаление по TTL идёт через min-heap: O(log n) на истёкший
+    проект вместо обхода всех записей.
+
+    max_projects ограничивает размер хранилища: при переполнении досрочно
+    удаляются завершённые проекты, ближайшие к истечению TTL. Проекты
+    в работе не вытесняются никогда.
+    """
+
+    def __init__(self, ttl_seconds: float, max_projects: int | None = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_projects = max_projects
+        self._shards: list[dict[str, dict]] = [{} for _ in range(STORE_SHARDS)]
+        self._locks = [threading.RLock() for _ in range(STORE_SHARDS)]
+        self._expiry: list[tuple[float, str]] = []
+        self._expiry_lock = threading.Lock()
+
+    def _shard(self, pid: str) -> tuple[dict[str, dict], threading.RLock]:
+        i = hash(pid) & (STORE_SHARDS - 1)
+        return self._shards[i], self._locks[i]
+
+    def __getitem__(self, pid: str) -> dict:
+        shard, lock = self._shard(pid)
+        with lock:
+            return shard[pid]
+
+    def __setitem__(self, pid: str, record: dict):
+        shard, lock = self._shard(pid)
+        with lock:
+            shard[pid] = record
+        if self.max_projects is not None:
+            self._evict_over_capacity()
+
+    def __delitem__(self, pid: str):
+        shard, lock = self._shard(pid)
+        with lock:
+            del shard[pid]
+
+    def __contains__(self, pid: str) -> bool:
+        shard, lock = self._shard(pid)
+        with lock:
+            return pid in shard
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def get(self, pid: str, default=None):
+        shard, lock = self._shard(pid)
+        with lock:
+            return shard.get(pid, default)
+
+    def pop(self, pid: str, default=None):
+        shard, lock = self._shard(pid)
+        with lock:
+            return shard.pop(pid, default)
+
+    def update(self, pid: str, **fields):
+        """Атомарно обновляет несколько полей записи (если проект существует)."""
+        shard, lock = self._shard(pid)
+        with lock:
+            record = shard.get(pid)
+            if record is not None:
+                record.update(fields)
+
+    def schedule_expiry(self, pid: str):
+        """Ставит проект в очередь на удаление через ttl_seconds от created_at."""
+        shard, lock = self._shard(pid)
+        with lock:
+            record = shard.get(pid)
+            if record is None:
+                return
+            expires_at = record.get("created_at", time.time()) + self.ttl_seconds
+        with self._expiry_lock:
+            heapq.heappush(self._expiry, (expires_at, pid))
+
+    def _pop_expiry(self, now: float | None = None) -> str | None:
+        """Достаёт ближайший к истечению проект (только истёкший к now, если now задан)."""
+        with self._expiry_lock:
+            if not self._expiry or (now is not None and self._expiry[0][0] > now):
+                return None
+            return heapq.heappop(self._expiry)[1]
+
+    def _evict_over_capacity(self):
+        """Удаляет завершённые проекты, пока хранилище больше max_projects."""
+        while len(self) > self.max_projects:
+            pid = self._pop_expiry()
+            if pid is None:
+                return
+            self.pop(pid)
+
+    def expire(self, now: float | None = None) -> int:
+        """Удаляет проекты с истёкшим TTL. Возвращает число удалённых."""
+        now = time.time() if now is None else now
+        removed = 0
+        while (pid := self._pop_expiry(now)) is not None:
+            if self.pop(pid) is not None:
+                removed += 1
+        return removed
@@ -1,3 +1,4 @@
+import functools
 import json
 import re
 import subprocess
@@ -5,59 +6,72 @@ from urllib.parse import urlparse
 
 from backend.config import ALLOWED_EXTENSIONS, ALLOWED_URL_HOSTS, logger
 
-FILENAME_STOP_WORDS = {
+FILENAME_STOP_WORDS = frozenset({
     "лайф", "лайфы", "интер", "синхрон", "снх", "бз",
     "f8", "wav", "mp3", "mp4", "mov", "wmv", "mxf",
-}
+})
+
+_TC_RE = re.compile(r"(\d{2}:\d{2}:\d{2}:\d{2})")
+_SPLIT_RE = re.compile(r"[,_]+")
+# Слово целиком из стоп-списка (без учёта регистра) или начинается с даты ДД.ММ.ГГГГ
+_NOT_SPEAKER_RE = re.compile(
+    r"(?:%s)\Z|\d{2}\.\d{2}\.\d{4}" % "|".join(map(re.escape, sorted(FILENAME_STOP_WORDS))),
+    re.IGNORECASE,
+)
+
+# "00".."99": таймкод собирается из готовых строк без форматирования чисел
+_TWO_DIGITS = tuple("%02d" % i for i in range(100))
 
 
 def parse_filename_metadata(filename: str) -> dict:
     """Извлекает имена спикеров и стартовый таймкод из названия файла."""
-    result = {"speakers": [], "start_tc": "00:00:00:00"}
+    speakers, start_tc = _parse_filename_cached(filename)
+    return {"speakers": list(speakers), "start_tc": start_tc}
 
-    tc_match = re.search(r"(\d{2}:\d{2}:\d{2}:\d{2})", filename)
-    if tc_match:
-        result["start_tc"] = tc_match.group(1)
-        filename = filename.replace(result["start_tc"], "")
 
-    clean_name = re.sub(r"\.[^.]+$", "", filename)
-    parts = re.split(r"[,_]+", clean_name)
+@functools.lru_cache(maxsize=256)
+def _parse_filename_cached(filename: str) -> tuple[tuple[str, ...], str]:
+    """Разбор имени файла; неизменяемый результат безопасно кэшировать."""
+    start_tc = "00:00:00:00"
+    tc_match = _TC_RE.search(filename)
+    if tc_match:
+        start_tc = tc_match.group(1)
+        filename = filename.replace(start_tc, "")
 
-    for part in parts:
+    clean_name = strip_extension(filename)
+    speakers = []
+    for part in _SPLIT_RE.split(clean_name):
         word = part.strip()
-        if (
-            word
-            and word.lower() not in FILENAME_STOP_WORDS
-            and not re.match(r"\d{2}\.\d{2}\.\d{4}", word)
-        ):
-            result["speakers"].append(word)
+        if word and not _NOT_SPEAKER_RE.match(word):
+            speakers.append(word)
 
-    return result
+    return tuple(speakers), start_tc
 
 
 def frames_to_tc(frames: int, fps: int = 25) -> str:
     """Конвертирует кадры в SMPTE таймкод."""
-    h = frames // (fps * 3600)
-    rem = frames % (fps * 3600)
-    m = rem // (fps * 60)
-    rem = rem % (fps * 60)
-    s = rem // fps
-    f = rem % fps
-    return f"{h:02d}:{m:02d}:{s:02d}:{f:02d}"
+    sec, f = divmod(frames, fps)
+    m, s = divmod(sec, 60)
+    h, m = divmod(m, 60)
+    if 0 <= h < 100 and f < 100:
+        d = _TWO_DIGITS
+        return f"{d[h]}:{d[m]}:{d[s]}:{d[f]}"
+    return "%02d:%02d:%02d:%02d" % (h, m, s, f)
 
 
 def tc_to_frames(tc_str: str, fps: int = 25) -> int:
     """Конвертирует SMPTE таймкод в кадры."""
     try:
-        parts = list(map(int, tc_str.split(":")))
-        return (parts[0] * 3600 + parts[1] * 60 + parts[2]) * fps + parts[3]
-    except (ValueError, IndexError):
+        h, m, s, f = tc_str.split(":")
+        return (int(h) * 3600 + int(m) * 60 + int(s)) * fps + int(f)
+    except ValueError:
         return 0
 
 
 def strip_extension(filename: str) -> str:
     """Убирает расширение файла."""
-    return re.sub(r"\.[^.]+$", "", filename)
+    head, dot, ext = filename.rpartition(".")
+    return head if dot and ext else filename
 
 
 def sanitize_filename(filename: str) -> str:
@@ -84,37 +98,58 @@ def validate_url(url: str) -> str | None:
 
 def validate_file_extension(filename: str) -> str | None:
     """Проверяет расширение файла. Возвращает ошибку или None."""
-    ext = re.search(r"(\.[^.]+)$", filename.lower())
-    if not ext or ext.group(1) not in ALLOWED_EXTENSIONS:
+    _, dot, ext = filename.lower().rpartition(".")
+    if not dot or "." + ext not in ALLOWED_EXTENSIONS:
         return f"Формат файла не поддерживается. Допустимые: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
     return None
 
 
-def detect_fps(file_path: str) -> int:
-    """Определяет FPS видеофайла через ffprobe. Возвращает 25 по умолчанию."""
+PROBE_TIMEOUT = 10  # s: битый MXF/MOV не должен вешать поток задачи
+
+
+def probe_media(file_path) -> dict | None:
+    """Читает метаданные медиафайла через ffprobe. Возвращает None при ошибке."""
     try:
         result = subprocess.run(
-            [
-                "ffprobe", "-v", "quiet",
-                "-select_streams", "v:0",
-                "-show_entries", "stream=r_frame_rate",
-                "-of", "json",
-                str(file_path),
-            ],
+            ["ffprobe", "-v", "quiet", "-show_format", "-show_streams", "-of", "json", str(file_path)],
             capture_output=True,
-            text=True,
-            timeout=10,
+            timeout=PROBE_TIMEOUT,
+            check=True,
         )
-        if result.returncode == 0:
-            data = json.loads(result.stdout)
-            streams = data.get("streams", [])
-            if streams:
-                rate_str = streams[0].get("r_frame_rate", "25/1")
-                num, den = map(int, rate_str.split("/"))
-                fps = round(num / den) if den else 25
-                if fps > 0:
-                    logger.info("Определён FPS: %d", fps)
-                    return fps
+        return json.loads(result.stdout)
+    except Exception as e:
+        logger.warning("Не удалось прочитать метаданные файла: %s", e)
+        return None
+
+
+def detect_fps(file_path: str, probe: dict | None = None) -> int:
+    """Определяет FPS видеофайла через ffprobe. Возвращает 25 по умолчанию.
+
+    Если передан probe (результат probe_media), ffprobe повторно не запускается.
+    """
+    if probe is None:
+        probe = probe_media(file_path)
+    try:
+        streams = [
+            st for st in (probe or {}).get("streams", [])
+            if st.get("codec_type") == "video" and not st.get("disposition", {}).get("attached_pic")
+        ]
+        if streams:
+            num, _, den = streams[0].get("r_frame_rate", "25/1").partition("/")
+            den = int(den or 1)
+            fps = round(int(num) / den) if den else 25
+            if fps > 0:
+                logger.info("Определён FPS: %d", fps)
+                return fps
     except Exception as e:
         logger.warning("Не удалось определить FPS: %s. Используется 25.", e)
     return 25
+
+
+def is_mono_opus_audio(probe: dict | None) -> bool:
+    """True, если в файле единственная аудиодорожка и она уже OPUS моно.
+
+    Такую дорожку можно переложить в OGG без перекодирования (-c:a copy).
+    """
+    audio = [st for st in (probe or {}).get("streams", []) if st.get("codec_type") == "audio"]
+    return len(audio) == 1 and audio[0].get("codec_name") == "opus" and audio[0].get("channels") == 1
@@ -1,14 +1,45 @@
-import subprocess
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 
-from backend.config import CORS_ORIGINS, TEMP_DIR, YANDEX_API_KEY, logger
+from backend.config import CORS_ORIGINS, TEMP_DIR, WHISPER_PRELOAD_MODEL, YANDEX_API_KEY, logger
 from backend.models import HealthResponse
 from backend.routes import router
+from backend.services import (
+    WHISPER_AVAILABLE,
+    close_http_session,
+    shutdown_task_executor,
+    start_ttl_cleanup,
+    stop_ttl_cleanup,
+    warmup_whisper_model,
+)
+
+
+def _remove_temp_entry(entry: os.DirEntry):
+    try:
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        else:
+            os.unlink(entry.path)
+    except OSError:
+        pass
+
+
+def _clear_temp_dir():
+    """Удаляет остатки задач из TEMP_DIR (после сбоя их могут быть тысячи — удаляем параллельно)."""
+    with os.scandir(TEMP_DIR) as it:
+        entries = list(it)
+    if entries:
+        with ThreadPoolExecutor(max_workers=16, thread_name_prefix="temp-cleanup") as pool:
+            pool.map(_remove_temp_entry, entries)
 
 
 @asynccontextmanager
@@ -19,25 +50,32 @@ async def lifespan(app: FastAPI):
     if not YANDEX_API_KEY:
         logger.warning("YANDEX_API_KEY не задан — облачное распознавание (SpeechKit) не будет работать.")
 
-    try:
-        result = subprocess.run(["ffmpeg", "-version"], capture_output=True, timeout=5)
-        if result.returncode == 0:
-            logger.info("FFmpeg найден.")
-        else:
-            logger.error("FFmpeg вернул код ошибки %d.", result.returncode)
-    except FileNotFoundError:
+    ffmpeg_path = shutil.which("ffmpeg")
+    if ffmpeg_path:
+        logger.info("FFmpeg найден: %s", ffmpeg_path)
+    else:
         logger.error("FFmpeg не найден в PATH. Установите ffmpeg.")
-    except Exception as e:
-        logger.error("Ошибка при проверке FFmpeg: %s", e)
+
+    if WHISPER_AVAILABLE and WHISPER_PRELOAD_MODEL:
+        threading.Thread(
+            target=warmup_whisper_model,
+            args=(WHISPER_PRELOAD_MODEL,),
+            name="whisper-warmup",
+            daemon=True,
+        ).start()
+        logger.info("Предзагрузка модели Whisper '%s' запущена в фоне.", WHISPER_PRELOAD_MODEL)
+
+    start_ttl_cleanup()
 
     logger.info("--- ПРОВЕРКИ ЗАВЕРШЕНЫ ---")
     yield
 
-    for f in TEMP_DIR.iterdir():
-        try:
-            f.unlink()
-        except OSError:
-            pass
+    stop_ttl_cleanup()
+    # Запущенные задачи должны завершиться до удаления TEMP_DIR и закрытия HTTP-сессии
+    shutdown_task_executor()
+    close_http_session()
+
+    _clear_temp_dir()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -49,6 +87,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Сжатие ответов: JSON с результатами, статика фронтенда, экспорт DOCX
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 app.include_router(router)
 
@@ -6,7 +6,9 @@ from main import app
 
 
 @pytest.fixture
-def client():
+def client(monkeypatch):
+    # Конвейер не запускаем: задача пошла бы в сеть, а остановка сервера ждёт её
+    monkeypatch.setattr("backend.routes.submit_task", lambda fn, *args, **kwargs: None)
     with TestClient(app) as c:
         yield c
 
@@ -0,0 +1,37 @@
+"""Unit tests for DOCX export."""
+
+from io import BytesIO
+
+from docx import Document
+
+from backend.docx_export import generate_docx
+
+
+def _segment_paragraph(text: str):
+    project = {
+        "original_filename": "interview.mp4",
+        "result": {
+            "segments": [{"timecode": "00:00:01:00", "speaker": "0", "text": text}],
+            "speakers": {"0": {"suggested_name": "Анна"}},
+        },
+    }
+    buffer = BytesIO()
+    generate_docx(project, {"0": "Анна"}, {"0": "АНН"}, buffer)
+    buffer.seek(0)
+    return Document(buffer).paragraphs[-1]
+
+
+class TestGenerateDocx:
+    def test_segment_text_is_escaped(self):
+        para = _segment_paragraph('a < b & "c"')
+        assert para.text == '00:00:01:00 АНН: a < b & "c"'
+
+    def test_newline_and_tab_match_add_run(self):
+        para = _segment_paragraph("line1\nline2 tab\there")
+        assert para.text == "00:00:01:00 АНН: line1\nline2 tab\there"
+
+        reference = Document().add_paragraph()
+        reference.add_run("line1\nline2 tab\there")
+        run_xml = para.runs[-1]._r.xml
+        assert run_xml.count("<w:br/>") == reference.runs[0]._r.xml.count("<w:br/>") == 1
+        assert run_xml.count("<w:tab/>") == reference.runs[0]._r.xml.count("<w:tab/>") == 1
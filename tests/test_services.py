@@ -0,0 +1,131 @@
+"""Unit tests for the Yandex.Disk download helpers and autosave reuse."""
+
+import pytest
+
+from backend import services
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, status_code: int):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {"content-length": str(len(body))}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+
+class FakeSession:
+    """Отдаёт data целиком (200) или запрошенный Range (206)."""
+
+    def __init__(self, data: bytes, ranged: bool = True, truncate_part_at: int | None = None):
+        self.data = data
+        self.ranged = ranged
+        self.truncate_part_at = truncate_part_at
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append(headers)
+        if not (self.ranged and headers):
+            return FakeResponse(self.data, 200)
+        lo, hi = map(int, headers["Range"].removeprefix("bytes=").split("-"))
+        body = self.data[lo:hi + 1]
+        if lo == self.truncate_part_at:
+            body = body[:-1]
+        return FakeResponse(body, 206)
+
+
+@pytest.fixture
+def download_env(monkeypatch):
+    """Маленькие части и чанки, чтобы файл в несколько КБ делился на много Range."""
+    monkeypatch.setattr(services, "YADISK_DOWNLOAD_PART_SIZE", 1024)
+    monkeypatch.setattr(services, "YADISK_DOWNLOAD_CHUNK_SIZE", 256)
+    monkeypatch.setattr(services, "YADISK_DOWNLOAD_PARTS", 2)
+    services.projects_db["dl"] = {"progress_percent": 0}
+    yield lambda session: monkeypatch.setattr(services, "_http_session", session)
+    services.projects_db.pop("dl")
+
+
+DATA = bytes(range(256)) * 40 + b"tail"  # 10244 bytes -> 11 parts
+
+
+class TestDownloadRanged:
+    def test_parts_land_at_their_offsets(self, download_env, tmp_path):
+        session = FakeSession(DATA)
+        download_env(session)
+        target = tmp_path / "video"
+
+        assert services._download_ranged("dl", "u", target, len(DATA)) is True
+        assert target.read_bytes() == DATA
+        assert len(session.requests) == 11
+        assert services.projects_db["dl"]["progress_percent"] == 100
+
+    def test_no_range_support_falls_back_to_single_stream(self, download_env, tmp_path):
+        session = FakeSession(DATA, ranged=False)
+        download_env(session)
+        target = tmp_path / "video"
+
+        assert services._download_ranged("dl", "u", target, len(DATA)) is False
+        services._download_single("dl", "u", target)
+        assert target.read_bytes() == DATA
+
+    def test_short_part_raises_and_stops_the_queue(self, download_env, monkeypatch, tmp_path):
+        monkeypatch.setattr(services, "YADISK_DOWNLOAD_PARTS", 1)  # deterministic part order
+        session = FakeSession(DATA, truncate_part_at=0)
+        download_env(session)
+
+        with pytest.raises(OSError, match="Неполная часть"):
+            services._download_ranged("dl", "u", tmp_path / "video", len(DATA))
+        assert len(session.requests) == 1
+
+
+class TestDownloadProgress:
+    def test_writes_are_throttled_but_final_percent_is_written(self, monkeypatch):
+        monkeypatch.setattr(services, "PROGRESS_UPDATE_INTERVAL", 3600)
+        services.projects_db["dl"] = {"progress_percent": 0}
+        try:
+            progress = services._DownloadProgress("dl", 100)
+            progress.add(10)  # first write goes through
+            assert services.projects_db["dl"]["progress_percent"] == 10
+            progress.add(40)  # inside the interval: skipped
+            assert services.projects_db["dl"]["progress_percent"] == 10
+            progress.add(50)  # completion is always written
+            assert services.projects_db["dl"]["progress_percent"] == 100
+        finally:
+            services.projects_db.pop("dl")
+
+
+class TestUnchangedSavedDocx:
+    def _record(self, path):
+        st = path.stat()
+        return {"docx_path": str(path), "docx_stat": (st.st_size, st.st_mtime_ns)}
+
+    def test_unchanged_file_is_reused(self, tmp_path):
+        path = tmp_path / "a.docx"
+        path.write_bytes(b"docx")
+        assert services._unchanged_saved_docx(self._record(path)) == str(path)
+
+    def test_edited_file_is_not_reused(self, tmp_path):
+        path = tmp_path / "a.docx"
+        path.write_bytes(b"docx")
+        proj = self._record(path)
+        path.write_bytes(b"edited by user")
+        assert services._unchanged_saved_docx(proj) is None
+
+    def test_missing_file_or_record(self, tmp_path):
+        path = tmp_path / "a.docx"
+        path.write_bytes(b"docx")
+        proj = self._record(path)
+        path.unlink()
+        assert services._unchanged_saved_docx(proj) is None
+        assert services._unchanged_saved_docx({}) is None
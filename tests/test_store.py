@@ -0,0 +1,84 @@
+"""Unit tests for the in-memory project store."""
+
+import threading
+
+from backend.store import ProjectStore
+
+
+class TestProjectStore:
+    def test_dict_like_access(self):
+        store = ProjectStore(ttl_seconds=60)
+        store["p1"] = {"status": "queued"}
+        assert "p1" in store
+        assert store["p1"]["status"] == "queued"
+        assert store.get("missing") is None
+        assert len(store) == 1
+
+    def test_update_sets_several_fields(self):
+        store = ProjectStore(ttl_seconds=60)
+        store["p1"] = {"status": "queued"}
+        store.update("p1", status="downloading", progress_percent=0)
+        assert store["p1"] == {"status": "downloading", "progress_percent": 0}
+
+    def test_update_missing_project_is_noop(self):
+        store = ProjectStore(ttl_seconds=60)
+        store.update("missing", status="error")
+        assert "missing" not in store
+
+    def test_expire_removes_only_scheduled_and_expired(self):
+        store = ProjectStore(ttl_seconds=100)
+        store["old"] = {"created_at": 1000.0}
+        store["fresh"] = {"created_at": 1050.0}
+        store["running"] = {"created_at": 900.0}
+        store.schedule_expiry("old")
+        store.schedule_expiry("fresh")
+
+        assert store.expire(now=1120.0) == 1
+        assert "old" not in store
+        assert "fresh" in store
+        assert "running" in store
+
+    def test_expire_skips_already_deleted(self):
+        store = ProjectStore(ttl_seconds=10)
+        store["p1"] = {"created_at": 0.0}
+        store.schedule_expiry("p1")
+        del store["p1"]
+        assert store.expire(now=100.0) == 0
+
+    def test_capacity_evicts_finished_projects_first(self):
+        store = ProjectStore(ttl_seconds=100, max_projects=2)
+        store["done_late"] = {"created_at": 20.0}
+        store["done_early"] = {"created_at": 10.0}
+        store.schedule_expiry("done_late")
+        store.schedule_expiry("done_early")
+        store["new"] = {"created_at": 30.0}
+        assert "done_early" not in store
+        assert "done_late" in store
+        assert "new" in store
+
+    def test_capacity_never_evicts_running_projects(self):
+        store = ProjectStore(ttl_seconds=100, max_projects=1)
+        store["running"] = {"created_at": 0.0}
+        store["new"] = {"created_at": 1.0}
+        assert len(store) == 2
+
+    def test_concurrent_writes_from_many_threads(self):
+        store = ProjectStore(ttl_seconds=60)
+
+        def worker(t):
+            for i in range(50):
+                pid = f"t{t}-p{i}"
+                store[pid] = {"status": "queued"}
+                store.update(pid, status="done", n=i)
+
+        threads = [threading.Thread(target=worker, args=(t,)) for t in range(8)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+
+        assert len(store) == 400
+        assert all(
+            store[f"t{t}-p{i}"] == {"status": "done", "n": i}
+            for t in range(8) for i in range(50)
+        )
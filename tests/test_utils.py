@@ -1,8 +1,14 @@
 """Unit tests for backend utility functions."""
 
+import subprocess
+
+from backend import utils
 from backend.utils import (
+    detect_fps,
     frames_to_tc,
+    is_mono_opus_audio,
     parse_filename_metadata,
+    probe_media,
     strip_extension,
     tc_to_frames,
     validate_file_extension,
@@ -35,6 +41,9 @@ class TestFramesToTc:
         assert frames_to_tc(24) == "00:00:00:24"
         assert frames_to_tc(25) == "00:00:01:00"
 
+    def test_hundred_hours_and_more(self):
+        assert frames_to_tc(100 * 3600 * 25 + 1) == "100:00:00:01"
+
 
 class TestTcToFrames:
     def test_zero(self):
@@ -72,6 +81,10 @@ class TestParseFilenameMetadata:
         assert "лайф" not in result["speakers"]
         assert "f8" not in result["speakers"]
 
+    def test_stop_words_ignore_case_but_match_whole_word(self):
+        result = parse_filename_metadata("ЛАЙФ_Лайфик_F8.mp4")
+        assert result["speakers"] == ["Лайфик"]
+
     def test_filters_dates(self):
         result = parse_filename_metadata("Имя, 05.11.2025_f8.mp3")
         dates = [s for s in result["speakers"] if "2025" in s]
@@ -81,6 +94,11 @@ class TestParseFilenameMetadata:
         result = parse_filename_metadata("f8.mp3")
         assert result["speakers"] == []
 
+    def test_cached_result_is_not_shared(self):
+        first = parse_filename_metadata("Иванов_Петров.mp4")
+        first["speakers"].append("лишний")
+        assert parse_filename_metadata("Иванов_Петров.mp4")["speakers"] == ["Иванов", "Петров"]
+
 
 class TestStripExtension:
     def test_basic(self):
@@ -125,3 +143,59 @@ class TestValidateFileExtension:
 
     def test_case_insensitive(self):
         assert validate_file_extension("FILE.MP3") is None
+
+
+class TestDetectFps:
+    def test_from_probe(self):
+        probe = {"streams": [
+            {"codec_type": "audio", "r_frame_rate": "0/0"},
+            {"codec_type": "video", "r_frame_rate": "30000/1001"},
+        ]}
+        assert detect_fps("unused.mp4", probe) == 30
+
+    def test_ignores_cover_art(self):
+        probe = {"streams": [
+            {"codec_type": "audio", "r_frame_rate": "0/0"},
+            {"codec_type": "video", "r_frame_rate": "90000/1", "disposition": {"attached_pic": 1}},
+        ]}
+        assert detect_fps("unused.mp3", probe) == 25
+
+    def test_integer_rate(self):
+        assert detect_fps("unused.mp4", {"streams": [{"codec_type": "video", "r_frame_rate": "50"}]}) == 50
+
+    def test_no_video_stream_defaults_to_25(self):
+        assert detect_fps("unused.wav", {"streams": [{"codec_type": "audio"}]}) == 25
+
+
+class TestIsMonoOpusAudio:
+    def test_mono_opus(self):
+        probe = {"streams": [{"codec_type": "audio", "codec_name": "opus", "channels": 1}]}
+        assert is_mono_opus_audio(probe) is True
+
+    def test_stereo_opus_needs_encode(self):
+        probe = {"streams": [{"codec_type": "audio", "codec_name": "opus", "channels": 2}]}
+        assert is_mono_opus_audio(probe) is False
+
+    def test_other_codec_or_no_probe(self):
+        probe = {"streams": [
+            {"codec_type": "video", "codec_name": "h264"},
+            {"codec_type": "audio", "codec_name": "aac", "channels": 1},
+        ]}
+        assert is_mono_opus_audio(probe) is False
+        assert is_mono_opus_audio(None) is False
+
+
+class TestProbeMedia:
+    def test_timeout_returns_none(self, tmp_path, monkeypatch):
+        media = tmp_path / "broken.mxf"
+        media.write_bytes(b"\0" * 16)
+
+        def hang(args, **kwargs):
+            assert kwargs["timeout"] == utils.PROBE_TIMEOUT
+            raise subprocess.TimeoutExpired(args, kwargs["timeout"])
+
+        monkeypatch.setattr(utils.subprocess, "run", hang)
+        assert probe_media(media) is None
+
+    def test_missing_file_returns_none(self, tmp_path):
+        assert probe_media(tmp_path / "missing.mp4") is None